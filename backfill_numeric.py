@@ -0,0 +1,122 @@
+# backfill_numeric.py — eski qatorlarga sonli ustunlarni (hajm, birlik, summa) yozish
+"""
+Bir martalik buyruq: 'Otgruzka' va 'Otgruzka (Hisobot)' varaqlaridagi matnli
+qty/price qiymatlarini utils_numeric parserlari bilan o'qib, ship_save yozadigan
+sonli ustunlarni to'ldiradi. Allaqachon to'ldirilgan kataklar o'zgarmaydi.
+
+    python backfill_numeric.py --dry-run
+    python backfill_numeric.py
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+from gspread.utils import rowcol_to_a1
+from loguru import logger
+
+from sheets_client import Sheets
+from utils_numeric import MAIN_NUMERIC_HEADER, VIEW_NUMERIC_HEADER, parse_qty, parse_price
+
+# (varaq, qty ustuni, price ustuni, sonli ustunlar sarlavhasi)
+TARGETS = [
+    ("Otgruzka", "qty", "price", MAIN_NUMERIC_HEADER),
+    ("Otgruzka (Hisobot)", "Kvadrati", "Yetkazish summasi", VIEW_NUMERIC_HEADER),
+]
+
+
+def _numeric_cells(row: list, i_qty: int, i_price: int) -> tuple[list, bool]:
+    qty = str(row[i_qty]) if i_qty < len(row) else ""
+    price = str(row[i_price]) if i_price < len(row) else ""
+    parsed_qty = parse_qty(qty)
+    price_sum = parse_price(price)
+    cells = [
+        parsed_qty[0] if parsed_qty else "",
+        parsed_qty[1] if parsed_qty else "",
+        price_sum if price_sum is not None else "",
+    ]
+    return cells, bool(parsed_qty) and price_sum is not None
+
+
+def backfill_sheet(ws, qty_header: str, price_header: str, numeric_header: list[str], dry_run: bool = False) -> None:
+    # Asl qiymatlar: ship_save yozgan sonlar son bo'lib qoladi, formatlangan matn bo'lib qaytmaydi
+    values = ws.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    if not values:
+        logger.info("'{}': bo'sh varaq.", ws.title)
+        return
+
+    headers = [str(h) for h in values[0]]
+    while headers and not headers[-1]:
+        headers.pop()
+    try:
+        i_qty = headers.index(qty_header)
+        i_price = headers.index(price_header)
+    except ValueError:
+        logger.warning("'{}': '{}' yoki '{}' ustuni topilmadi, o'tkazib yuborildi.", ws.title, qty_header, price_header)
+        return
+    if numeric_header[0] in headers:
+        col = headers.index(numeric_header[0])
+    else:
+        col = len(headers)
+    width = len(numeric_header)
+
+    # Faqat o'zgargan qatorlar (va kerak bo'lsa sarlavha) yoziladi
+    updates = []
+    if headers[col:col + width] != numeric_header:
+        updates.append((1, list(numeric_header)))
+    filled = failed = 0
+    for row_no, row in enumerate(values[1:], start=2):
+        current = [row[c] if c < len(row) else "" for c in range(col, col + width)]
+        if all(str(v).strip() for v in current):
+            continue
+        cells, ok = _numeric_cells(row, i_qty, i_price)
+        cells = [cur if str(cur).strip() else new for cur, new in zip(current, cells)]
+        if ok:
+            filled += 1
+        else:
+            failed += 1
+            logger.warning(
+                "'{}' {}-qator: qty={!r} price={!r} to'liq o'qilmadi.",
+                ws.title, row_no,
+                row[i_qty] if i_qty < len(row) else "",
+                row[i_price] if i_price < len(row) else "",
+            )
+        if cells != current:
+            updates.append((row_no, cells))
+
+    logger.info("'{}': {} qator to'ldirildi, {} qatorda xato.", ws.title, filled, failed)
+    if dry_run or not updates:
+        return
+
+    if ws.col_count < col + width:
+        ws.add_cols(col + width - ws.col_count)
+    ws.batch_update([
+        {
+            "range": f"{rowcol_to_a1(row_no, col + 1)}:{rowcol_to_a1(row_no, col + width)}",
+            "values": [cells],
+        }
+        for row_no, cells in updates
+    ])
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="Sonli ustunlarni eski qatorlar uchun to'ldirish")
+    p.add_argument("--dry-run", action="store_true", help="faqat tekshirish, Sheets'ga yozmaydi")
+    args = p.parse_args(argv)
+
+    sheets = Sheets(
+        os.getenv("SHEETS_SPREADSHEET_ID", ""),
+        credentials_json=os.getenv("GOOGLE_CREDENTIALS_JSON"),
+        credentials_b64=os.getenv("GOOGLE_CREDENTIALS_JSON_B64"),
+    )
+    for title, qty_header, price_header, numeric_header in TARGETS:
+        try:
+            ws = sheets.sh.worksheet(title)
+        except Exception:
+            logger.warning("'{}' varagi topilmadi.", title)
+            continue
+        backfill_sheet(ws, qty_header, price_header, numeric_header, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
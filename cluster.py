@@ -0,0 +1,300 @@
+# cluster.py — ko'p jarayonli rejim (chat_id bo'yicha sharding + bitta Sheets writer)
+"""
+`uvicorn --workers N` bilan ishlatib bo'lmaydi: har bir worker webhook'ni qayta o'rnatadi,
+FSM holati esa bitta jarayon xotirasida. Bu modul o'rniga quyidagi tuzilmani ishga tushiradi:
+
+* front (shu jarayon) — HTTP qabul qiladi va webhook'ni yagona o'zi o'rnatadi/o'chiradi;
+* WORKERS ta worker — update ``chat_id % WORKERS`` bo'yicha taqsimlanadi, shuning uchun
+  bitta suhbat (va uning FSM holati) doim bitta jarayonda qoladi;
+* writer — Sheets'ga barcha yozuvlar shu bitta jarayon orqali ketma-ket o'tadi.
+
+    WORKERS=4 python cluster.py
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import sys
+
+import uvicorn
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import PlainTextResponse
+from loguru import logger
+
+import main
+from settings import settings
+
+_ctx = mp.get_context("spawn")
+
+
+def chat_id_of(update: dict) -> int:
+    """Update ichidagi chat (yoki foydalanuvchi) id; topilmasa 0."""
+    for key, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat") or event.get("from") or {}
+        if "id" in chat:
+            return int(chat["id"])
+    return 0
+
+
+# ===== Worker: o'z shard'idagi update'larni qayta ishlaydi =====
+async def _worker(idx: int, update_q, ack_q, write_q, result_q):
+    loop = asyncio.get_running_loop()
+    pending: dict[int, asyncio.Future] = {}
+    job_ids = itertools.count(1)
+    tasks: set[asyncio.Task] = set()
+
+    def spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def notify_late(chat_id: int, job_id: int, fut: asyncio.Future):
+        if fut.exception():
+            text = "❌ Saqlashda xato. Keyinroq urinib ko‘ring."
+        else:
+            text = "✅ Yozuv saqlandi. Rahmat!"
+        try:
+            await main.bot.send_message(chat_id, text, reply_markup=main.main_menu())
+        except Exception as e:
+            logger.exception("Worker {}: job {} natijasini yuborib bo'lmadi: {}", idx, job_id, e)
+
+    async def write_via_writer(main_row, p_row, view_row, chat_id: int | None = None):
+        job_id = next(job_ids)
+        fut = loop.create_future()
+        pending[job_id] = fut
+        write_q.put((idx, job_id, (main_row, p_row, view_row)))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=settings.SHEETS_WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Job navbatda qoladi va baribir yoziladi: "xato" desak operator qayta kiritadi -> dublikat.
+            # Natija kelganda chatga alohida xabar yuboriladi.
+            logger.warning("Worker {}: Sheets writer {:g}s ichida javob bermadi (job {}), kutilmoqda.",
+                           idx, settings.SHEETS_WRITE_TIMEOUT, job_id)
+            if chat_id is not None:
+                fut.add_done_callback(lambda f: spawn(notify_late(chat_id, job_id, f)))
+            raise main.SavePending() from None
+
+    async def read_results():
+        while True:
+            job_id, error = await loop.run_in_executor(None, result_q.get)
+            if job_id is None:
+                return
+            fut = pending.pop(job_id, None)
+            if fut is None or fut.done():
+                continue
+            if error:
+                fut.set_exception(RuntimeError(error))
+            else:
+                fut.set_result(None)
+
+    main.sheets_writer = write_via_writer
+    await loop.run_in_executor(None, main.connect_sheets)
+    results_task = asyncio.create_task(read_results())
+
+    # Bitta chat update'lari kelish tartibida, turli chatlar — parallel.
+    # chat_id -> [lock, foydalanuvchilar soni]; hech kim kutmasa yozuv o'chiriladi
+    chat_locks: dict[int, list] = {}
+
+    async def process(token: int, update: dict):
+        chat_id = chat_id_of(update)
+        entry = chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        ok = False
+        try:
+            async with entry[0]:
+                await main.dp.feed_webhook_update(main.bot, update)
+            ok = True
+        except Exception as e:
+            logger.exception("Worker {}: update qayta ishlashda xato: {}", idx, e)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del chat_locks[chat_id]
+            # Front HTTP javobini shu ack'dan keyin qaytaradi (ok=False -> 500, Telegram qayta yuboradi)
+            ack_q.put((token, ok))
+
+    logger.info("Worker {} ishga tushdi.", idx)
+    while True:
+        item = await loop.run_in_executor(None, update_q.get)
+        if item is None:
+            break
+        spawn(process(*item))
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Kechikkan yozuvlar natijasini kutib, chatlarga xabar berib bo'lamiz (writer hali ishlayapti;
+    # chegara — run() dagi join timeout)
+    if pending:
+        await asyncio.wait(list(pending.values()))
+    await asyncio.gather(*tasks, return_exceptions=True)
+    result_q.put((None, None))
+    await results_task
+    await main.bot.session.close()
+
+
+def _ignore_stop_signals():
+    # To'xtatish front orqali (None sentinel): Ctrl+C/SIGTERM butun guruhga kelsa ham navbat oxirigacha ishlanadi
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def worker_main(idx: int, update_q, ack_q, write_q, result_q):
+    _ignore_stop_signals()
+    asyncio.run(_worker(idx, update_q, ack_q, write_q, result_q))
+
+
+# ===== Writer: Sheets'ga yagona yozuvchi =====
+def writer_main(write_q, result_qs):
+    _ignore_stop_signals()
+    main.connect_sheets()
+    logger.info("Sheets writer ishga tushdi.")
+    while True:
+        job = write_q.get()
+        if job is None:
+            break
+        idx, job_id, rows = job
+        error = None
+        try:
+            if main.sheets_instance is None:
+                raise RuntimeError("Sheets ulanmagan")
+            main.write_shipment(main.sheets_instance.sh, *rows)
+        except Exception as e:
+            logger.exception("Sheets writer: yozishda xato: {}", e)
+            error = repr(e)
+        result_qs[idx].put((job_id, error))
+
+
+# ===== Front: HTTP + webhook =====
+app = FastAPI()
+update_queues: list = []
+worker_procs: list = []
+writer_proc = None
+server: uvicorn.Server | None = None
+ack_q = None
+acks: dict[int, asyncio.Future] = {}
+_tokens = itertools.count(1)
+
+@app.get("/", response_class=PlainTextResponse)
+@app.head("/", response_class=PlainTextResponse)
+def health():
+    return "ok"
+
+@app.post("/webhook/{secret}")
+async def tg_webhook(secret: str, request: Request):
+    if secret != settings.WEBHOOK_SECRET:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        update_dict = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Bad update")
+    shard = chat_id_of(update_dict) % len(update_queues)
+    # Jarayon o'lgan bo'lsa — 503: Telegram update'ni keyinroq qayta yuboradi
+    if not (worker_procs[shard].is_alive() and writer_proc.is_alive()):
+        raise HTTPException(status_code=503, detail="Worker unavailable")
+
+    # main.tg_webhook kabi: 200 faqat update qayta ishlangandan keyin (worker ack)
+    token = next(_tokens)
+    fut = asyncio.get_running_loop().create_future()
+    acks[token] = fut
+    update_queues[shard].put((token, update_dict))
+    try:
+        while True:
+            try:
+                ok = await asyncio.wait_for(asyncio.shield(fut), timeout=1.0)
+                break
+            except asyncio.TimeoutError:
+                if not worker_procs[shard].is_alive():
+                    raise HTTPException(status_code=503, detail="Worker died")
+    finally:
+        acks.pop(token, None)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Update failed")
+    return {"ok": True}
+
+async def _read_acks():
+    loop = asyncio.get_running_loop()
+    while True:
+        token, ok = await loop.run_in_executor(None, ack_q.get)
+        if token is None:
+            return
+        fut = acks.get(token)
+        if fut is not None and not fut.done():
+            fut.set_result(ok)
+
+def _dead_children() -> list:
+    return [p for p in [*worker_procs, writer_proc] if not p.is_alive()]
+
+async def _watchdog(interval: float = 1.0):
+    """Biror worker yoki writer to'xtasa — front ham to'xtaydi, platforma butun clusterni qayta ishga tushiradi."""
+    while not server.should_exit:
+        dead = _dead_children()
+        if dead:
+            for p in dead:
+                logger.error("Cluster: {} to'xtadi (exitcode={}), front to'xtatilmoqda.", p.name, p.exitcode)
+            server.should_exit = True
+            return
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def on_startup():
+    await main.register_webhook()
+    app.state.acks = asyncio.create_task(_read_acks())
+    app.state.watchdog = asyncio.create_task(_watchdog())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    ack_q.put((None, None))
+    await app.state.acks
+    await main.on_shutdown()
+    await main.bot.session.close()
+
+
+def run():
+    global writer_proc, server, ack_q
+    workers = settings.WORKERS
+    ack_q = _ctx.Queue()
+    write_q = _ctx.Queue()
+    result_qs = [_ctx.Queue() for _ in range(workers)]
+    update_queues[:] = [_ctx.Queue() for _ in range(workers)]
+
+    writer_proc = _ctx.Process(target=writer_main, args=(write_q, result_qs), name="sheets-writer")
+    worker_procs[:] = [
+        _ctx.Process(target=worker_main, args=(i, update_queues[i], ack_q, write_q, result_qs[i]), name=f"worker-{i}")
+        for i in range(workers)
+    ]
+    writer_proc.start()
+    for p in worker_procs:
+        p.start()
+    logger.info("Cluster: {} worker + 1 Sheets writer.", workers)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000"))))
+    # uvicorn to'xtagach signalni qayta ko'taradi: SIGTERM ham KeyboardInterrupt bo'lsin,
+    # aks holda jarayon quyidagi tozalashdan oldin o'ladi
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for q in update_queues:
+            q.put(None)
+        # Worker'lar kechikkan yozuvlar natijasini ham kutadi (SHEETS_WRITE_TIMEOUT gacha)
+        for p in worker_procs:
+            p.join(timeout=settings.SHEETS_WRITE_TIMEOUT + 30)
+        write_q.put(None)
+        writer_proc.join(timeout=30)
+        for p in [*worker_procs, writer_proc]:
+            if p.is_alive():
+                p.kill()
+
+    # Jarayonlardan biri xato bilan tugagan bo'lsa — nol bo'lmagan kod, platforma qayta ishga tushiradi
+    if any(p.exitcode for p in [*worker_procs, writer_proc]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,439 @@
+# loadtest.py — webhook yuklama testi (Bot API va Sheets stub bilan)
+"""
+Bitta instansiya nechta operatorga yetishini o'lchash uchun harness.
+
+Ilova alohida jarayonda ishga tushadi: Bot API so'rovlari lokal stub serverga,
+Google Sheets chaqiruvlari esa sozlanadigan kechikishli soxta backendga yo'naltiriladi.
+Generator ko'p chatlar nomidan to'liq ShipForm oqimi, foto albomlar va hisobot
+tugmalarini ``/webhook/{secret}`` ga yuboradi va har bir parallellik darajasi uchun
+throughput, handler bo'yicha p50/p99, xatolar ulushi va event-loop kechikishini chiqaradi.
+
+    python loadtest.py --levels 1,5,10,25,50 --rounds 2 --sheets-latency 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+WEBHOOK_SECRET = "loadtest"
+TELEGRAM_TOKEN = "123456:LOADTEST"
+STATS_PATH = "/__loadtest/stats"
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# ===== Bot API stub (alohida thread, o'z event loop'i bilan) =====
+def _start_bot_api_stub(port: int, latency: float) -> str:
+    from aiohttp import web
+
+    msg_ids = itertools.count(1000)
+
+    async def handle(request: web.Request):
+        method = request.match_info["method"].lower()
+        form = await request.post()
+        if latency:
+            await asyncio.sleep(latency)
+        if method in ("sendmessage", "editmessagetext"):
+            chat_id = int(form.get("chat_id") or 0)
+            result = {
+                "message_id": int(form.get("message_id") or next(msg_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": form.get("text", ""),
+            }
+        elif method == "getme":
+            result = {"id": 123456, "is_bot": True, "first_name": "loadtest"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    ready = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        api = web.Application()
+        api.router.add_post("/bot{token}/{method}", handle)
+        runner = web.AppRunner(api, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="bot-api-stub", daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}"
+
+
+# ===== Sheets stub (gspread kabi sinxron, har chaqiruvda kechikish) =====
+def _make_fake_sheets(latency: float, fail_rate: float = 0.0):
+    from gspread.exceptions import WorksheetNotFound
+
+    class FakeWorksheet:
+        def __init__(self, title: str):
+            self.title = title
+            self.rows: list[list[str]] = []
+
+        def _wait(self):
+            if latency:
+                time.sleep(latency)
+            if fail_rate and random.random() < fail_rate:
+                raise ConnectionError("fake Sheets: injected failure")
+
+        def append_row(self, row):
+            self._wait()
+            self.rows.append(["" if v is None else str(v) for v in row])
+
+        def row_values(self, i: int):
+            self._wait()
+            return list(self.rows[i - 1]) if i <= len(self.rows) else []
+
+        def delete_rows(self, i: int):
+            self._wait()
+            del self.rows[i - 1]
+
+        def insert_rows(self, rows, i: int):
+            self._wait()
+            self.rows[i - 1:i - 1] = [list(r) for r in rows]
+
+        def get_all_values(self, **kwargs):
+            self._wait()
+            return [list(r) for r in self.rows]
+
+    class FakeSpreadsheet:
+        def __init__(self):
+            self.sheets: dict[str, FakeWorksheet] = {}
+
+        def worksheet(self, title: str):
+            if latency:
+                time.sleep(latency)
+            try:
+                return self.sheets[title]
+            except KeyError:
+                raise WorksheetNotFound(title)
+
+        def add_worksheet(self, title: str, rows: int = 1, cols: int = 1):
+            if latency:
+                time.sleep(latency)
+            return self.sheets.setdefault(title, FakeWorksheet(title))
+
+    class FakeSheets:
+        def __init__(self, spreadsheet_id: str, credentials_json: str | None = None, credentials_b64: str | None = None):
+            self.sh = FakeSpreadsheet()
+
+    return FakeSheets
+
+
+# ===== Ilova jarayoni =====
+def _install_probes(main) -> None:
+    """Handler vaqtlari, xatolar va event-loop kechikishini yig'uvchi o'lchagichlar.
+
+    Xato — handlerdan chiqqan exception yoki handler ichida ERROR darajada log qilingan
+    va yutib yuborilgan xato (masalan ship_save: "❌ Saqlashda xato").
+    """
+    from loguru import logger
+
+    samples: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    lag: list[float] = []
+    failed = contextvars.ContextVar("loadtest_failed", default=None)
+
+    def error_sink(message):
+        flag = failed.get()
+        if flag is not None:
+            flag[0] = True
+
+    logger.add(error_sink, level="ERROR", format="{message}")
+
+    async def timing(handler, event, data):
+        name = data["handler"].callback.__name__
+        flag = [False]
+        token = failed.set(flag)
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            flag[0] = True
+            raise
+        finally:
+            samples[name].append((time.perf_counter() - t0) * 1000)
+            if flag[0]:
+                errors[name] += 1
+            failed.reset(token)
+
+    main.router.message.middleware(timing)
+    main.router.callback_query.middleware(timing)
+
+    async def lag_monitor(interval: float = 0.05):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag.append(max(0.0, (time.perf_counter() - t0 - interval) * 1000))
+
+    async def start_lag_monitor():
+        main.app.state.lag_task = asyncio.create_task(lag_monitor())
+
+    main.app.add_event_handler("startup", start_lag_monitor)
+
+    @main.app.get(STATS_PATH)
+    def loadtest_stats(reset: bool = False):
+        out = {
+            "handlers": {
+                name: {
+                    "count": len(vals),
+                    "errors": errors.get(name, 0),
+                    "p50": _pct(vals, 0.50),
+                    "p99": _pct(vals, 0.99),
+                }
+                for name, vals in sorted(samples.items())
+            },
+            "lag": {"p50": _pct(lag, 0.50), "p99": _pct(lag, 0.99), "max": max(lag, default=0.0)},
+        }
+        if reset:
+            samples.clear()
+            errors.clear()
+            lag.clear()
+        return out
+
+
+def serve(args) -> None:
+    os.environ["TELEGRAM_TOKEN"] = TELEGRAM_TOKEN
+    os.environ["WEBHOOK_SECRET"] = WEBHOOK_SECRET
+    os.environ["BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    logging.basicConfig(level=logging.WARNING)
+
+    stub_base = _start_bot_api_stub(args.api_port, args.api_latency)
+
+    import uvicorn
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    import main
+
+    main.bot.session = AiohttpSession(api=TelegramAPIServer.from_base(stub_base))
+    main.Sheets = _make_fake_sheets(args.sheets_latency, args.sheets_fail_rate)
+    main.SHEETS_SPREADSHEET_ID = "loadtest"
+    _install_probes(main)
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# ===== Update generatori =====
+class Operator:
+    """Bitta simulyatsiya qilingan chat: ketma-ket update'lar yuboradi."""
+
+    update_ids = itertools.count(1)
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.user = {"id": chat_id, "is_bot": False, "first_name": f"Op{chat_id}"}
+        self.chat = {"id": chat_id, "type": "private"}
+        self.msg_ids = itertools.count(1)
+
+    def _message(self, **fields) -> dict:
+        return {
+            "update_id": next(self.update_ids),
+            "message": {
+                "message_id": next(self.msg_ids),
+                "date": int(time.time()),
+                "chat": self.chat,
+                "from": self.user,
+                **fields,
+            },
+        }
+
+    def text(self, text: str) -> dict:
+        return self._message(text=text)
+
+    def photo(self, group: str, n: int) -> dict:
+        fid = f"AgAC_{self.chat_id}_{group}_{n}"
+        size = {"file_id": fid, "file_unique_id": fid, "width": 1280, "height": 960}
+        return self._message(photo=[size], media_group_id=group)
+
+    def tap(self, data: str) -> dict:
+        return {
+            "update_id": next(self.update_ids),
+            "callback_query": {
+                "id": str(next(self.update_ids)),
+                "from": self.user,
+                "chat_instance": str(self.chat_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self.msg_ids),
+                    "date": int(time.time()),
+                    "chat": self.chat,
+                    "text": "menu",
+                },
+            },
+        }
+
+    def walkthrough(self, round_no: int) -> list[dict | list[dict]]:
+        """To'liq ShipForm oqimi + hisobotlar. Ichki ro'yxat — bir vaqtda keladigan albom."""
+        group = f"{self.chat_id}{round_no}"
+        today = time.strftime("%Y-%m-%d")
+        return [
+            self.text("/start"),
+            self.tap("ship"),
+            self.text("Gabbro 600×300×30"),
+            self.text("23.5 m²"),
+            self.text(str(4 + round_no % 6)),
+            self.text("Samarqand viloyati"),
+            self.text("+998901234567"),
+            [self.photo(group, i) for i in range(3 + round_no % 2)],
+            self.tap("ship:next"),
+            self.text("2 500 000"),
+            self.text("Brigada 1"),
+            self.tap("ship:ok"),
+            self.tap("rpt:today"),
+            self.tap("rpt:30"),
+            self.tap("rpt:range"),
+            self.text("2025-01-01"),
+            self.text(today),
+        ]
+
+
+async def _post(session, url: str, update: dict, client: dict) -> None:
+    t0 = time.perf_counter()
+    try:
+        async with session.post(url, json=update) as resp:
+            await resp.read()
+            ok = resp.status == 200
+    except Exception:
+        ok = False
+    client["latency"].append((time.perf_counter() - t0) * 1000)
+    client["sent"] += 1
+    if not ok:
+        client["errors"] += 1
+
+
+async def _run_operator(session, url: str, op: Operator, rounds: int, think: float, client: dict) -> None:
+    for round_no in range(rounds):
+        for step in op.walkthrough(round_no):
+            if isinstance(step, list):
+                await asyncio.gather(*(_post(session, url, u, client) for u in step))
+            else:
+                await _post(session, url, step, client)
+            if think:
+                await asyncio.sleep(think)
+
+
+async def _run_level(session, base: str, level: int, args) -> dict:
+    url = f"{base}/webhook/{WEBHOOK_SECRET}"
+    async with session.get(f"{base}{STATS_PATH}", params={"reset": "true"}) as resp:
+        await resp.read()
+
+    client = {"sent": 0, "errors": 0, "latency": []}
+    ops = [Operator(chat_id=level * 100_000 + i) for i in range(level)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_run_operator(session, url, op, args.rounds, args.think, client) for op in ops))
+    elapsed = time.perf_counter() - t0
+
+    async with session.get(f"{base}{STATS_PATH}", params={"reset": "true"}) as resp:
+        server = await resp.json()
+    return {"level": level, "elapsed": elapsed, "client": client, "server": server}
+
+
+def _print_level(res: dict) -> None:
+    c, s = res["client"], res["server"]
+    rate = c["sent"] / res["elapsed"] if res["elapsed"] else 0.0
+    err = 100.0 * c["errors"] / c["sent"] if c["sent"] else 0.0
+    lag = s["lag"]
+    print(
+        f"\n=== {res['level']} operator: {c['sent']} update / {res['elapsed']:.1f}s = {rate:.1f} upd/s, "
+        f"xato {err:.2f}%, http p50 {_pct(c['latency'], 0.5):.0f}ms p99 {_pct(c['latency'], 0.99):.0f}ms"
+    )
+    print(f"    event-loop lag: p50 {lag['p50']:.1f}ms  p99 {lag['p99']:.1f}ms  max {lag['max']:.1f}ms")
+    print(f"    {'handler':<24}{'n':>7}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, h in s["handlers"].items():
+        print(f"    {name:<24}{h['count']:>7}{h['errors']:>6}{h['p50']:>10.1f}{h['p99']:>10.1f}")
+
+
+async def _wait_ready(session, base: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Ilova jarayoni to'xtadi (stderr'ni tekshiring).")
+        try:
+            async with session.get(f"{base}/") as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Ilova ishga tushmadi.")
+
+
+async def drive(args) -> list[dict]:
+    import aiohttp
+
+    base = f"http://127.0.0.1:{args.port}"
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--serve",
+        "--port", str(args.port), "--api-port", str(args.api_port),
+        "--sheets-latency", str(args.sheets_latency), "--api-latency", str(args.api_latency),
+        "--sheets-fail-rate", str(args.sheets_fail_rate),
+    ]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    try:
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+            await _wait_ready(session, base, proc)
+            for level in args.levels:
+                res = await _run_level(session, base, level, args)
+                _print_level(res)
+                results.append(res)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return results
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Webhook yuklama testi")
+    p.add_argument("--levels", default="1,5,10,25,50",
+                   type=lambda s: [int(x) for x in s.split(",") if x.strip()],
+                   help="parallel operatorlar soni, vergul bilan")
+    p.add_argument("--rounds", type=int, default=2, help="har bir operator nechta to'liq oqim bajaradi")
+    p.add_argument("--think", type=float, default=0.0, help="update'lar orasidagi pauza, s")
+    p.add_argument("--sheets-latency", type=float, default=0.3, help="har bir Sheets chaqiruvi kechikishi, s")
+    p.add_argument("--sheets-fail-rate", type=float, default=0.0, help="Sheets chaqiruvi xato bilan tugash ehtimoli (0..1)")
+    p.add_argument("--api-latency", type=float, default=0.05, help="Bot API stub javob kechikishi, s")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--api-port", type=int, default=8766)
+    p.add_argument("--json", metavar="PATH", help="natijalarni JSON faylga yozish")
+    p.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        results = asyncio.run(drive(args))
+        if args.json:
+            for res in results:
+                res["client"].pop("latency")
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
@@ -21,6 +21,10 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from settings import settings  # TELEGRAM_TOKEN, BASE_URL, WEBHOOK_SECRET
+from utils_numeric import (
+    MAIN_NUMERIC_HEADER, VIEW_NUMERIC_HEADER, UNIT_M, UNIT_M2,
+    parse_qty, parse_price, cell_number, cell_money, fmt_money,
+)
 
 # ===== Timezone =====
 LOCAL_TZ_NAME = os.getenv("LOCAL_TZ", "Asia/Tashkent")
@@ -110,6 +114,64 @@ async def cmd_start(message: types.Message):
 async def cmd_help(message: types.Message):
     await message.answer("Yordam: /start — menyu, 🚚 Отгрузка — yangi yozuv, hisobot tugmalari — ko‘rish.")
 
+# ===== Sheets yozish =====
+# Cluster rejimida (cluster.py) yozuvlar bitta writer jarayoniga yuboriladi:
+# sheets_writer — async callable(main_row, p_row, view_row, chat_id=...). Oddiy rejimda None.
+sheets_writer = None
+
+class SavePending(Exception):
+    """Writer belgilangan vaqtda javob bermadi, lekin yozuv navbatda: natija keyin chatga yuboriladi."""
+
+def write_shipment(sh, main_row: list, p_row: list, view_row: list) -> None:
+    """Otgruzka, Photos va 'Otgruzka (Hisobot)' varaqlariga bitta yozuv qo'shadi (sinxron, gspread)."""
+    # 1) Otgruzka
+    try:
+        ws_main = sh.worksheet("Otgruzka")
+    except Exception:
+        ws_main = sh.add_worksheet(title="Otgruzka", rows=1, cols=20)
+        ws_main.append_row([
+            "order_id", "time", "type_size", "qty", "pallets",
+            "dest", "driver", "price", "loader", "user",
+            *MAIN_NUMERIC_HEADER,
+        ])
+    ws_main.append_row(main_row)
+
+    # 2) Photos
+    try:
+        ws_ph = sh.worksheet("Photos")
+    except Exception:
+        ws_ph = sh.add_worksheet(title="Photos", rows=1, cols=10)
+        ws_ph.append_row(["order_id", "file1", "file2", "file3", "file4"])
+    ws_ph.append_row(p_row)
+
+    # 3) Otgruzka (Hisobot) — foydalanuvchi ko‘rinishi
+    VIEW_SHEET_TITLE = "Otgruzka (Hisobot)"
+    desired_header = [
+        "Sana",
+        "Granit turi",
+        "Kvadrati",
+        "Paddon soni",
+        "Qayerga ketyapti",
+        "Haydovchi raqami",
+        "Foto surat",
+        "Yetkazish summasi",
+        "Kim yukladi",
+        *VIEW_NUMERIC_HEADER,
+    ]
+    try:
+        ws_view = sh.worksheet(VIEW_SHEET_TITLE)
+    except Exception:
+        ws_view = sh.add_worksheet(title=VIEW_SHEET_TITLE, rows=1, cols=20)
+        ws_view.append_row(desired_header)
+    try:
+        first_row = ws_view.row_values(1)
+        if first_row != desired_header:
+            ws_view.delete_rows(1)
+            ws_view.insert_rows([desired_header], 1)
+    except Exception:
+        pass
+    ws_view.append_row(view_row)
+
 # ===== Отгрузка oqimi =====
 PHONE_RE = re.compile(r"^\+?\d{9,15}$")
 
@@ -134,7 +196,12 @@ async def ship_type_size(message: types.Message, state: FSMContext):
 
 @router.message(ShipForm.qty, F.text)
 async def ship_qty(message: types.Message, state: FSMContext):
-    await state.update_data(qty=message.text.strip())
+    parsed = parse_qty(message.text)
+    if not parsed:
+        await message.answer("Hajm formati noto‘g‘ri. Masalan: <code>23.5 m²</code> yoki <code>12.4 m</code>")
+        return
+    qty_value, qty_unit = parsed
+    await state.update_data(qty=message.text.strip(), qty_value=qty_value, qty_unit=qty_unit)
     await state.set_state(ShipForm.pallets)
     await message.answer("3) <b>Poddonlar soni</b>ni kiriting (butun son).", reply_markup=cancel_menu())
 
@@ -187,7 +254,11 @@ async def ship_photos_next(cb: types.CallbackQuery, state: FSMContext):
 
 @router.message(ShipForm.price, F.text)
 async def ship_price(message: types.Message, state: FSMContext):
-    await state.update_data(price=message.text.strip())
+    price_sum = parse_price(message.text)
+    if price_sum is None:
+        await message.answer("Summa formati noto‘g‘ri. Masalan: <code>2 500 000</code>")
+        return
+    await state.update_data(price=message.text.strip(), price_sum=price_sum)
     await state.set_state(ShipForm.loader)
     await message.answer("8) <b>Kim yukladi?</b> (FIO yoki brigada nomi).", reply_markup=cancel_menu())
 
@@ -204,7 +275,7 @@ async def ship_loader(message: types.Message, state: FSMContext):
         f"• Poddon: {data.get('pallets')}\n"
         f"• Manzil: {data.get('dest')}\n"
         f"• Haydovchi: {data.get('driver')}\n"
-        f"• Narx: {data.get('price')}\n"
+        f"• Narx: {fmt_money(data.get('price_sum', 0))} so‘m\n"
         f"• Yuklagan: {data.get('loader')}\n"
         f"• Foto: {len(data.get('photos', []))} ta\n"
         f"• Sana: {data.get('ts')} ({LOCAL_TZ_NAME})"
@@ -234,75 +305,44 @@ async def ship_save(cb: types.CallbackQuery, state: FSMContext):
         data.get("price"),
         data.get("loader"),
         cb.from_user.full_name,
+        data.get("qty_value"),
+        data.get("qty_unit"),
+        data.get("price_sum"),
     ]
 
     file_ids = data.get("photos", [])
     p_row = [order_id] + [file_ids[i] if i < len(file_ids) else "" for i in range(4)]
 
+    photo_cell = " ".join([fid for fid in file_ids if fid])
+    view_row = [
+        data.get("ts"),             # Sana
+        data.get("type_size"),      # Granit turi
+        data.get("qty"),            # Kvadrati/uzunligi
+        str(data.get("pallets")),   # Paddon soni
+        data.get("dest"),           # Qayerga ketyapti
+        data.get("driver"),         # Haydovchi raqami
+        photo_cell,                 # Foto file_id lar
+        data.get("price"),          # Yetkazish summasi
+        data.get("loader"),         # Kim yukladi
+        data.get("qty_value"),      # Hajm (son)
+        data.get("qty_unit"),       # Birlik: m² / m
+        data.get("price_sum"),      # Summa (butun so'm)
+    ]
+
     try:
         if Sheets and SHEETS_SPREADSHEET_ID and sheets_instance:
-            # 1) Otgruzka
-            try:
-                ws_main = sheets_instance.sh.worksheet("Otgruzka")
-            except Exception:
-                ws_main = sheets_instance.sh.add_worksheet(title="Otgruzka", rows=1, cols=20)
-                ws_main.append_row([
-                    "order_id", "time", "type_size", "qty", "pallets",
-                    "dest", "driver", "price", "loader", "user"
-                ])
-            ws_main.append_row(main_row)
-
-            # 2) Photos
-            try:
-                ws_ph = sheets_instance.sh.worksheet("Photos")
-            except Exception:
-                ws_ph = sheets_instance.sh.add_worksheet(title="Photos", rows=1, cols=10)
-                ws_ph.append_row(["order_id", "file1", "file2", "file3", "file4"])
-            ws_ph.append_row(p_row)
-
-            # 3) Otgruzka (Hisobot) — foydalanuvchi ko‘rinishi
-            VIEW_SHEET_TITLE = "Otgruzka (Hisobot)"
-            desired_header = [
-                "Sana",
-                "Granit turi",
-                "Kvadrati",
-                "Paddon soni",
-                "Qayerga ketyapti",
-                "Haydovchi raqami",
-                "Foto surat",
-                "Yetkazish summasi",
-                "Kim yukladi",
-            ]
-            try:
-                ws_view = sheets_instance.sh.worksheet(VIEW_SHEET_TITLE)
-            except Exception:
-                ws_view = sheets_instance.sh.add_worksheet(title=VIEW_SHEET_TITLE, rows=1, cols=20)
-                ws_view.append_row(desired_header)
-            try:
-                first_row = ws_view.row_values(1)
-                if first_row != desired_header:
-                    ws_view.delete_rows(1)
-                    ws_view.insert_rows([desired_header], 1)
-            except Exception:
-                pass
-
-            photo_cell = " ".join([fid for fid in file_ids if fid])
-            view_row = [
-                data.get("ts"),             # Sana
-                data.get("type_size"),      # Granit turi
-                data.get("qty"),            # Kvadrati/uzunligi
-                str(data.get("pallets")),   # Paddon soni
-                data.get("dest"),           # Qayerga ketyapti
-                data.get("driver"),         # Haydovchi raqami
-                photo_cell,                 # Foto file_id lar
-                data.get("price"),          # Yetkazish summasi
-                data.get("loader"),         # Kim yukladi
-            ]
-            ws_view.append_row(view_row)
-
+            if sheets_writer is not None:
+                await sheets_writer(main_row, p_row, view_row, chat_id=cb.message.chat.id)
+            else:
+                write_shipment(sheets_instance.sh, main_row, p_row, view_row)
             await cb.message.edit_text("✅ Yozuv saqlandi. Rahmat!", reply_markup=main_menu())
         else:
             await cb.message.edit_text("⚠️ Sheets ulanmagan. Admin sozlamalarini tekshiring.", reply_markup=main_menu())
+    except SavePending:
+        await cb.message.edit_text(
+            "⏳ Yozuv navbatda. Saqlangach shu yerga xabar keladi — qayta kiritmang.",
+            reply_markup=main_menu(),
+        )
     except Exception as e:
         logger.exception("Sheets yozishda xato: {}", e)
         await cb.message.edit_text("❌ Saqlashda xato. Keyinroq urinib ko‘ring.", reply_markup=main_menu())
@@ -333,6 +373,30 @@ def _split_chunks(text: str, limit: int = 3500):
         parts.append("\n".join(buf))
     return parts
 
+def _numeric_totals_text(selected: list, i_val: int | None, i_unit: int | None, i_sum: int | None) -> str:
+    """Hajm (birlik bo'yicha) va Summa — ship_save yozgan sonli ustunlardan oddiy yig'indi.
+
+    Ustunlar hali yo'q bo'lsa (birinchi saqlash yoki backfill'dan oldin) — "n/a".
+    """
+    if i_val is None or i_unit is None:
+        qty_text = "<b>n/a</b>"
+    else:
+        total_qty = {UNIT_M2: 0.0, UNIT_M: 0.0}
+        for r in selected:
+            unit = r[i_unit] if i_unit < len(r) else ""
+            val  = cell_number(r[i_val] if i_val < len(r) else "")
+            total_qty[unit if unit in total_qty else UNIT_M2] += val
+        qty_text = ", ".join(f"<b>{v:g} {u}</b>" for u, v in total_qty.items() if v) or "<b>0</b>"
+    if i_sum is None:
+        sum_text = "<b>n/a</b>"
+    else:
+        total_sum = sum(cell_money(r[i_sum] if i_sum < len(r) else "") for r in selected)
+        sum_text = f"<b>{fmt_money(total_sum)}</b> so‘m"
+    return (
+        f"• Hajm yig‘indi: {qty_text}\n"
+        f"• Summa: {sum_text}"
+    )
+
 async def _report_text(days: int) -> str:
     if not (Sheets and SHEETS_SPREADSHEET_ID and sheets_instance):
         return "⚠️ Sheets ulanmagan. Hisobot uchun admin sozlashi kerak."
@@ -341,7 +405,7 @@ async def _report_text(days: int) -> str:
 
 async def _report_summary_for(date_str: str) -> str:
     """
-    'Otgruzka (Hisobot)' varagidan: Zakazlar / Poddon / Hajm yig'indi
+    'Otgruzka (Hisobot)' varagidan: Zakazlar / Poddon / Hajm / Summa yig'indi
     satrlari: Sana Soat • Granit turi • Kvadrati • Paddon
     """
     if not (Sheets and SHEETS_SPREADSHEET_ID and sheets_instance):
@@ -353,7 +417,8 @@ async def _report_summary_for(date_str: str) -> str:
     except Exception:
         return f"'{VIEW_SHEET_TITLE}' varagi topilmadi."
 
-    rows_all = ws.get_all_values()
+    # Hajm/Summa — sonlar: formatlangan matn emas, asl qiymat ("2,500,000" emas, 2500000)
+    rows_all = ws.get_all_values(value_render_option="UNFORMATTED_VALUE")
     if not rows_all or len(rows_all) < 2:
         return f"📆 <b>{date_str}</b> uchun yozuv topilmadi."
 
@@ -370,6 +435,7 @@ async def _report_summary_for(date_str: str) -> str:
     i_type = find_i("Granit turi")
     i_qty  = find_i("Kvadrati")
     i_pal  = find_i("Paddon soni")
+    i_val, i_unit, i_sum = (find_i(h) for h in VIEW_NUMERIC_HEADER)
 
     for_need = [i_sana, i_type, i_qty, i_pal]
     if any(i is None for i in for_need):
@@ -378,29 +444,23 @@ async def _report_summary_for(date_str: str) -> str:
 
     selected = []
     for r in rows:
-        ts = r[i_sana] if i_sana < len(r) else ""
+        ts = str(r[i_sana]) if i_sana < len(r) else ""
         if ts[:10] == date_str:
             selected.append(r)
 
     if not selected:
         return f"📆 <b>{date_str}</b> uchun yozuv topilmadi."
 
-    def _float_in_text(s: str) -> float:
-        m = re.findall(r"[\d]+(?:[.,]\d+)?", s or "")
-        return float(m[0].replace(",", ".")) if m else 0.0
-
     total_orders = len(selected)
     total_pallets = 0
-    total_qty = 0.0
     for r in selected:
         pallets = r[i_pal] if i_pal < len(r) else ""
-        qty     = r[i_qty] if i_qty < len(r) else ""
         total_pallets += int(pallets) if str(pallets).isdigit() else 0
-        total_qty     += _float_in_text(qty)
+    totals_text = _numeric_totals_text(selected, i_val, i_unit, i_sum)
 
     lines = []
     for r in selected:
-        full_time = r[i_sana] if i_sana < len(r) else ""
+        full_time = str(r[i_sana]) if i_sana < len(r) else ""
         d = full_time[:10]
         tm = full_time[11:16] if len(full_time) >= 16 else ""
         tsize = r[i_type] if i_type < len(r) else ""
@@ -412,17 +472,13 @@ async def _report_summary_for(date_str: str) -> str:
         f"📆 <b>{date_str}</b> kunlik hisobot\n"
         f"• Zakazlar: <b>{total_orders}</b>\n"
         f"• Poddon: <b>{total_pallets}</b>\n"
-        f"• Hajm yig‘indi: <b>{total_qty:g}</b>\n\n"
+        f"{totals_text}\n\n"
     )
     return header + "\n".join(lines)
 
 # ===== Sana oralig'i hisobot =====
 DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
-def _parse_float_text(s: str) -> float:
-    m = re.findall(r"[\d]+(?:[.,]\d+)?", s or "")
-    return float(m[0].replace(",", ".")) if m else 0.0
-
 async def _report_range(date_from: str, date_to: str) -> str:
     """
     Manba: 'Otgruzka (Hisobot)' varagi
@@ -436,7 +492,8 @@ async def _report_range(date_from: str, date_to: str) -> str:
     except Exception:
         return "'Otgruzka (Hisobot)' varagi topilmadi."
 
-    rows_all = ws.get_all_values()
+    # Hajm/Summa — sonlar: formatlangan matn emas, asl qiymat ("2,500,000" emas, 2500000)
+    rows_all = ws.get_all_values(value_render_option="UNFORMATTED_VALUE")
     if not rows_all or len(rows_all) < 2:
         return f"📆 {date_from} — {date_to} oralig‘ida yozuv topilmadi."
 
@@ -453,6 +510,7 @@ async def _report_range(date_from: str, date_to: str) -> str:
     i_type = find_i("Granit turi")
     i_qty  = find_i("Kvadrati")
     i_pal  = find_i("Paddon soni")
+    i_val, i_unit, i_sum = (find_i(h) for h in VIEW_NUMERIC_HEADER)
 
     if None in (i_sana, i_type, i_qty, i_pal):
         return ("'Otgruzka (Hisobot)' sarlavhalari kutilgandek emas. "
@@ -460,7 +518,7 @@ async def _report_range(date_from: str, date_to: str) -> str:
 
     selected = []
     for r in rows:
-        ts = r[i_sana] if i_sana < len(r) else ""
+        ts = str(r[i_sana]) if i_sana < len(r) else ""
         d = ts[:10]
         if DATE_RE.match(d) and (date_from <= d <= date_to):
             selected.append(r)
@@ -470,16 +528,14 @@ async def _report_range(date_from: str, date_to: str) -> str:
 
     total_orders = len(selected)
     total_pallets = 0
-    total_qty = 0.0
     for r in selected:
         pal = r[i_pal] if i_pal < len(r) else ""
-        qty = r[i_qty] if i_qty < len(r) else ""
         total_pallets += int(pal) if str(pal).isdigit() else 0
-        total_qty     += _parse_float_text(qty)
+    totals_text = _numeric_totals_text(selected, i_val, i_unit, i_sum)
 
     lines = []
     for r in selected:
-        full_time = r[i_sana] if i_sana < len(r) else ""
+        full_time = str(r[i_sana]) if i_sana < len(r) else ""
         d = full_time[:10]
         tm = full_time[11:16] if len(full_time) >= 16 else ""
         tsize = r[i_type] if i_type < len(r) else ""
@@ -491,7 +547,7 @@ async def _report_range(date_from: str, date_to: str) -> str:
         f"📆 <b>{date_from}</b> — <b>{date_to}</b> oralig‘i hisobot\n"
         f"• Zakazlar: <b>{total_orders}</b>\n"
         f"• Poddon: <b>{total_pallets}</b>\n"
-        f"• Hajm yig‘indi: <b>{total_qty:g}</b>\n"
+        f"{totals_text}\n"
     )
     return header + "\n\n" + "\n".join(lines)
 
@@ -581,14 +637,14 @@ async def tg_webhook(secret: str, request: Request):
     return {"ok": True}
 
 # ===== Startup/Shutdown =====
-@app.on_event("startup")
-async def on_startup():
+async def register_webhook():
     base = str(settings.BASE_URL).rstrip("/")
     webhook_url = f"{base}/webhook/{settings.WEBHOOK_SECRET}"
     logger.info(f"Setting webhook to: {webhook_url}")
     await bot.set_webhook(url=webhook_url, drop_pending_updates=True)
     logger.info("Webhook set successfully.")
 
+def connect_sheets():
     global sheets_instance
     if Sheets and SHEETS_SPREADSHEET_ID:
         try:
@@ -606,6 +662,11 @@ async def on_startup():
                 e,
             )
 
+@app.on_event("startup")
+async def on_startup():
+    await register_webhook()
+    connect_sheets()
+
 @app.on_event("shutdown")
 async def on_shutdown():
     try:
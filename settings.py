@@ -7,6 +7,8 @@ class Settings(BaseSettings):
     WEBHOOK_SECRET: str = Field(..., description="Random secret string for webhook path, e.g. 'whk_9f2b...' ")
     ENV: str = Field(default="production")
     LOG_LEVEL: str = Field(default="INFO")
+    WORKERS: int = Field(default=1, ge=1, description="cluster.py: number of update worker processes (sharded by chat_id)")
+    SHEETS_WRITE_TIMEOUT: float = Field(default=60, gt=0, description="cluster.py: seconds ship_save waits for the Sheets writer before reporting the save as pending")
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,62 @@
+import re
+
+UNIT_M2 = "m²"
+UNIT_M = "m"
+
+# ship_save yozadigan sonli ustunlar (eski qatorlar — backfill_numeric.py)
+MAIN_NUMERIC_HEADER = ["qty_value", "qty_unit", "price_sum"]
+VIEW_NUMERIC_HEADER = ["Hajm", "Birlik", "Summa"]
+
+_SPACES = re.compile(r"\s+")
+_QTY_RE = re.compile(
+    r"^(\d+(?:[.,]\d+)?)\s*"
+    r"(m²|m2|m\^2|kv\.?\s*m|кв\.?\s*м|м²|м2|metr|метр|m|м)?\.?$",
+    re.IGNORECASE,
+)
+_PRICE_RE = re.compile(r"^(?:\d{1,3}(?:[ .,'’]\d{3})+|\d+)$")
+_CURRENCY_RE = re.compile(r"\s*(?:so['‘’`]?m|сум|sum|uzs)\.?$", re.IGNORECASE)
+
+
+def parse_qty(text: str) -> tuple[float, str] | None:
+    """'23.5 m²' -> (23.5, 'm²'), '12,4 m' -> (12.4, 'm'). Birlik yo'q bo'lsa — m²."""
+    s = _SPACES.sub(" ", (text or "").strip())
+    m = _QTY_RE.match(s)
+    if not m:
+        return None
+    value = float(m.group(1).replace(",", "."))
+    unit = (m.group(2) or "").lower()
+    if unit in ("m", "м", "metr", "метр"):
+        return value, UNIT_M
+    return value, UNIT_M2
+
+
+def parse_price(text: str) -> int | None:
+    """'2 500 000', '2,500,000', '2500000 so‘m' -> 2500000 (butun so'm)."""
+    s = _SPACES.sub(" ", (text or "").strip())
+    s = _CURRENCY_RE.sub("", s)
+    if not _PRICE_RE.match(s):
+        return None
+    return int(re.sub(r"\D", "", s))
+
+
+def cell_number(value) -> float:
+    """Hajm katagi (UNFORMATTED_VALUE yoki matn) -> float, bo'sh bo'lsa 0. '1.250' -> 1.25, '12,4' -> 12.4."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = _SPACES.sub("", str(value or "")).replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+
+def cell_money(value) -> float:
+    """Summa katagi -> float. Matn bo'lsa parse_price bilan: '2,500,000' / '2.500.000' -> 2500000."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    price = parse_price(str(value or ""))
+    return float(price) if price is not None else 0.0
+
+
+def fmt_money(value: float) -> str:
+    return f"{int(value):,}".replace(",", " ")